@@ -16,6 +16,19 @@ from system_prompts import (
     rubric_requirements_correctness as RUBRIC_FIX_SYSTEM_PROMPT,
     rubric_explanation as RUBRIC_EXPLANATION_PROMPT
 )
+from structured_output import (
+    BREAKDOWN_ITEM_SCHEMA,
+    COMPLEXITY_NOTES_SCHEMA,
+    COMPLEXITY_SCHEMA,
+    REQUIREMENT_ISSUE_SCHEMA,
+    REQUIREMENTS_FIXES_SCHEMA,
+    RESPONSE_SCHEMAS,
+    complexity_totals,
+    matches_schema,
+    record as record_structured_output,
+    response_format,
+    salvage_json,
+)
 
 MODEL_NAME = "gpt-5"
 ENV_FILE_NAME = ".env"
@@ -26,6 +39,20 @@ EVALUATION_CHOICES: List[Tuple[str, str]] = [
     ("rubric_explanation", "Generate rubric explanation (plain language, no bullets or markdown symbols)"),
     ("requirements_fixes", "Identify requirements that need improvement"),
 ]
+EVALUATION_PROMPTS: Dict[str, Tuple[str, str]] = {
+    "complexity_check": (COMPLEXITY_SYSTEM_PROMPT, "complexity_propt"),
+    "rubric_explanation": (RUBRIC_EXPLANATION_PROMPT, "rubric_explanation"),
+}
+MAX_BREAKDOWN_RETRIES = 1
+BREAKDOWN_RETRY_INSTRUCTION = (
+    "Only the rubric requirements listed above still need grading. Apply the same scoring rules and "
+    'return {"breakdown": [...]} with exactly one breakdown item per listed requirement.'
+)
+SALVAGED_NOTES = {
+    "method": "Breakdown salvaged from a partial model response; totals recomputed from the breakdown.",
+    "assumptions": "NONE",
+    "limitations": "Notes were missing from the model response.",
+}
 
 def get_request_data(url):
   headers = {
@@ -76,10 +103,9 @@ _load_env_file()
 def _get_secret(key: str, default: str = "") -> str:
     """Safely read a key from Streamlit secrets when available."""
     try:
-        secrets = st.secrets  # type: ignore[attr-defined]
+        return st.secrets.get(key, default)  # type: ignore[attr-defined]
     except Exception:
         return default
-    return secrets.get(key, default)
 
 
 def _initialize_session_state() -> None:
@@ -145,10 +171,20 @@ def _resolve_api_key() -> str:
     return (st.session_state.get("openai_api_key") or os.getenv("OPENAI_API_KEY", "")).strip()
 
 
-def _call_model(messages: List[Dict[str, str]], api_key: str) -> str:
+def _call_model(messages: List[Dict[str, str]], api_key: str, schema_name: Optional[str] = None) -> str:
     client = OpenAI(api_key=api_key) if api_key else OpenAI()
-    completion = client.chat.completions.create(model=MODEL_NAME, messages=messages)
-    message = completion.choices[0].message
+    request_options: Dict[str, Any] = {}
+    if schema_name:
+        request_options["response_format"] = response_format(schema_name)
+    completion = client.chat.completions.create(model=MODEL_NAME, messages=messages, **request_options)
+    choice = completion.choices[0]
+    message = choice.message
+    refusal = getattr(message, "refusal", None)
+    if refusal:
+        record_structured_output("refusals")
+        raise RuntimeError(f"Model refused the request: {refusal}")
+    if choice.finish_reason == "length":
+        record_structured_output("truncated")
     return message.content or ""
 
 
@@ -172,25 +208,162 @@ def _build_complexity_user_payload(data: Mapping[str, Any], type_of_data=None) -
     return json.dumps(payload, ensure_ascii=False, indent=2)
 
 
-def evaluate_complexity_level(data_to_render: Mapping[str, Any], api_key: str, system_prompt, user_payload) -> Dict[str, Any]:
+def _normalise_id(value: Any) -> str:
+    return str(value or "").strip().casefold()
+
+
+def _rubric_entry_id(entry: Any) -> str:
+    if not isinstance(entry, Mapping):
+        return ""
+    return _normalise_id(entry.get("id", entry.get("ID")))
+
+
+def _request_missing_breakdown(
+    data_to_render: Mapping[str, Any], api_key: str, system_prompt: str, missing_entries: List[Any]
+) -> List[Any]:
+    """Ask the model to grade only the rubric entries that have no usable breakdown item."""
+    user_payload = _build_complexity_user_payload({**data_to_render, "rubric_entries": missing_entries})
+    response_text = _call_model(
+        [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_payload},
+            {"role": "user", "content": BREAKDOWN_RETRY_INSTRUCTION},
+        ],
+        api_key=api_key,
+        schema_name="breakdown_retry",
+    )
+    parsed, _ = salvage_json(response_text)
+    items = parsed.get("breakdown") if isinstance(parsed, dict) else None
+    return items if isinstance(items, list) else []
+
+
+def _complete_complexity_result(
+    response_text: str, data_to_render: Mapping[str, Any], api_key: str, system_prompt: str
+) -> Dict[str, Any]:
+    """Return the complexity result, re-requesting only missing or invalid breakdown items.
+
+    When every rubric entry carries a distinct ID, the breakdown is matched against
+    the rubric: items for unknown or repeated IDs are discarded, entries without a
+    valid item are graded in a follow-up call, and totals are recomputed from the
+    merged breakdown. A strictly parsed, schema-valid response that covers the
+    rubric exactly (or cannot be matched to it) is returned as is.
+    """
+    parsed, salvaged = salvage_json(response_text)
+    schema_valid = not salvaged and matches_schema(parsed, COMPLEXITY_SCHEMA)
+
+    rubric_entries = data_to_render.get("rubric_entries") or []
+    if isinstance(rubric_entries, Mapping):
+        rubric_entries = [rubric_entries]
+    entry_ids = [_rubric_entry_id(entry) for entry in rubric_entries]
+    if not entry_ids or not all(entry_ids) or len(set(entry_ids)) != len(entry_ids):
+        if schema_valid:
+            record_structured_output("valid")
+            return parsed
+        record_structured_output("failed")
+        raise RuntimeError(f"Model response is not valid JSON: {response_text}")
+    entries_by_id = dict(zip(entry_ids, rubric_entries))
+
+    breakdown: Dict[str, Dict[str, Any]] = {}
+    discarded_items = 0
+    raw_items = parsed.get("breakdown") if isinstance(parsed, dict) else None
+    for item in raw_items if isinstance(raw_items, list) else []:
+        if not matches_schema(item, BREAKDOWN_ITEM_SCHEMA):
+            continue
+        item_id = _normalise_id(item["id"])
+        if item_id in entries_by_id and item_id not in breakdown:
+            breakdown[item_id] = item
+        else:
+            discarded_items += 1
+
+    missing_ids = [entry_id for entry_id in entry_ids if entry_id not in breakdown]
+    if schema_valid and not missing_ids and not discarded_items:
+        record_structured_output("valid")
+        return parsed
+    if discarded_items:
+        record_structured_output("discarded_items", discarded_items)
+
+    salvaged_items = len(breakdown)
+    for _ in range(MAX_BREAKDOWN_RETRIES):
+        if not missing_ids:
+            break
+        record_structured_output("retries")
+        record_structured_output("retried_items", len(missing_ids))
+        missing_entries = [entries_by_id[entry_id] for entry_id in missing_ids]
+        for item in _request_missing_breakdown(data_to_render, api_key, system_prompt, missing_entries):
+            if not matches_schema(item, BREAKDOWN_ITEM_SCHEMA):
+                continue
+            item_id = _normalise_id(item["id"])
+            if item_id in missing_ids and item_id not in breakdown:
+                breakdown[item_id] = item
+        missing_ids = [entry_id for entry_id in missing_ids if entry_id not in breakdown]
+
+    if missing_ids:
+        record_structured_output("failed")
+        raise RuntimeError(f"Model response is missing breakdown items for: {', '.join(missing_ids)}")
+
+    if salvaged_items:
+        record_structured_output("salvaged")
+        record_structured_output("salvaged_items", salvaged_items)
+    ordered_breakdown = [breakdown[entry_id] for entry_id in entry_ids]
+    notes = parsed.get("notes") if isinstance(parsed, dict) else None
+    if not matches_schema(notes, COMPLEXITY_NOTES_SCHEMA):
+        notes = dict(SALVAGED_NOTES)
+    return {**complexity_totals(ordered_breakdown), "breakdown": ordered_breakdown, "notes": notes}
+
+
+def _parse_requirements_fixes(response_text: str) -> Dict[str, Any]:
+    """Return the flagged requirements; ``incomplete`` is set when issues had to be salvaged."""
+    parsed, salvaged = salvage_json(response_text)
+    if matches_schema(parsed, REQUIREMENT_ISSUE_SCHEMA):
+        parsed = [parsed]
+    raw_issues = parsed.get("issues") if isinstance(parsed, dict) else parsed
+    if not isinstance(raw_issues, list):
+        record_structured_output("failed")
+        raise RuntimeError(f"Unexpected response structure for requirements fixes: {response_text}")
+
+    issues = [issue for issue in raw_issues if matches_schema(issue, REQUIREMENT_ISSUE_SCHEMA)]
+    if not salvaged and len(issues) == len(raw_issues):
+        record_structured_output("valid")
+        return {"issues": issues, "incomplete": False}
+    if not issues:
+        record_structured_output("failed")
+        raise RuntimeError(f"No complete requirement issues could be recovered: {response_text}")
+
+    record_structured_output("salvaged")
+    record_structured_output("salvaged_items", len(issues))
+    return {"issues": issues, "incomplete": True}
+
+
+def evaluate_complexity_level(
+    data_to_render: Mapping[str, Any], api_key: str, evaluation: str = "complexity_check"
+) -> Dict[str, Any]:
+    if evaluation not in EVALUATION_PROMPTS:
+        raise ValueError(f"Unknown evaluation: {evaluation}")
     if not api_key or not api_key.strip():
         raise ValueError("OpenAI API key is required to run the complexity evaluation.")
 
+    system_prompt, type_of_data = EVALUATION_PROMPTS[evaluation]
     response_text = _call_model(
         [
             {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_payload},
+            {"role": "user", "content": _build_complexity_user_payload(data_to_render, type_of_data)},
         ],
         api_key=api_key,
+        schema_name=evaluation,
     )
 
-    try:
-        return json.loads(response_text)
-    except json.JSONDecodeError as exc:
-        raise RuntimeError(f"Model response is not valid JSON: {response_text}") from exc
+    if evaluation == "complexity_check":
+        return _complete_complexity_result(response_text, data_to_render, api_key, system_prompt)
+
+    parsed, salvaged = salvage_json(response_text)
+    if not matches_schema(parsed, RESPONSE_SCHEMAS[evaluation]):
+        record_structured_output("failed")
+        raise RuntimeError(f"Model response is not valid JSON: {response_text}")
+    record_structured_output("salvaged" if salvaged else "valid")
+    return parsed
 
 
-def evaluate_requirements_fixes(data_to_render: Mapping[str, Any], api_key: str) -> List[Dict[str, Any]]:
+def evaluate_requirements_fixes(data_to_render: Mapping[str, Any], api_key: str) -> Dict[str, Any]:
     if not api_key or not api_key.strip():
         raise ValueError("OpenAI API key is required to run the requirements evaluation.")
 
@@ -210,18 +383,17 @@ def evaluate_requirements_fixes(data_to_render: Mapping[str, Any], api_key: str)
             {"role": "user", "content": json.dumps(payload, ensure_ascii=False, indent=2)},
         ],
         api_key=api_key,
+        schema_name="requirements_fixes",
     )
 
-    try:
-        parsed = json.loads(response_text)
-    except json.JSONDecodeError as exc:
-        raise RuntimeError(f"Model response is not valid JSON: {response_text}") from exc
+    return _parse_requirements_fixes(response_text)
 
-    if isinstance(parsed, list):
-        return parsed
-    if isinstance(parsed, dict):
-        return [parsed]
-    raise RuntimeError(f"Unexpected response structure for requirements fixes: {response_text}")
+
+def run_evaluation(evaluation: str, data_to_render: Mapping[str, Any], api_key: str) -> Any:
+    """Run one of the EVALUATION_CHOICES against a processed conversation payload."""
+    if evaluation == "requirements_fixes":
+        return evaluate_requirements_fixes(data_to_render, api_key)
+    return evaluate_complexity_level(data_to_render, api_key, evaluation)
 
 
 @st.cache_data(show_spinner=False)
@@ -432,16 +604,8 @@ def main() -> None:
             eval_results: Dict[str, Any] = {}
             with st.spinner("Running evaluations ..."):
                 try:
-                    
-                    if "complexity_check" in st.session_state.selected_evaluations:
-                        user_payload = _build_complexity_user_payload(data_to_render, "complexity_propt")
-                        eval_results["complexity_check"] = evaluate_complexity_level(data_to_render, api_key, COMPLEXITY_SYSTEM_PROMPT, user_payload)
-                    elif "requirements_fixes" in st.session_state.selected_evaluations:
-                        user_payload = _build_complexity_user_payload(data_to_render, "requirement_prompt")
-                        eval_results["complexity_check"] = evaluate_complexity_level(data_to_render, api_key, RUBRIC_FIX_SYSTEM_PROMPT, user_payload)
-                    elif "rubric_explanation" in st.session_state.selected_evaluations:
-                        user_payload = _build_complexity_user_payload(data_to_render, "rubric_explanation")
-                        eval_results["complexity_check"] = evaluate_complexity_level(data_to_render, api_key, RUBRIC_EXPLANATION_PROMPT, user_payload)
+                    evaluation = st.session_state.selected_evaluations[0]
+                    eval_results["complexity_check"] = run_evaluation(evaluation, data_to_render, api_key)
                 except Exception as error:  # noqa: BLE001
                     st.error(f"Evaluation failed: {error}")
                 else:
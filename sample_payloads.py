@@ -0,0 +1,37 @@
+"""Model response builders shared by the test modules."""
+
+
+def breakdown_item(item_id, weight=5, contribution=5, decision="Pass", item_type="requirement"):
+    return {
+        "section": "Analysis",
+        "id": item_id,
+        "weight": weight,
+        "type": item_type,
+        "decision": decision,
+        "reason": "Cited explicitly.",
+        "score_contribution": contribution,
+    }
+
+
+def complexity_response(items):
+    return {
+        "totals": {
+            "positive_weight_total": 0,
+            "negative_weight_total": 0,
+            "score_before_penalties": 0,
+            "penalties_applied": 0,
+            "final_score": 0,
+            "pass_rate_percent": 0,
+        },
+        "complexity_level": "Expert-level",
+        "breakdown": items,
+        "notes": {"method": "Strict.", "assumptions": "NONE", "limitations": "None."},
+    }
+
+
+def rubric(*ids):
+    return {"prompt": "Question", "nova_response": "Report", "rubric_entries": [{"id": value} for value in ids]}
+
+
+def issue(issue_id):
+    return {"id": issue_id, "error_code": "Cohesion", "reason": "Vague.", "rewrite_suggestion": "Quantify."}
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from main import (
+    EVALUATION_CHOICES,
+    _get_data_to_render,
+    _get_secret,
+    get_conversation_data,
+    run_evaluation,
+)
+from structured_output import stats as structured_output_stats
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8080"))
+WORKER_COUNT = int(os.getenv("SERVICE_WORKERS", "4"))
+QUEUE_MAX_DEPTH = int(os.getenv("SERVICE_QUEUE_DEPTH", "32"))
+MAX_BATCH_SIZE = int(os.getenv("SERVICE_MAX_BATCH_SIZE", "16"))
+LT_API_KEY_HEADER = "X-LT-API-Key"
+RETRY_AFTER_SECONDS = 5
+EVALUATION_KEYS = [value for value, _ in EVALUATION_CHOICES]
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the worker pool cannot accept more jobs."""
+
+
+@dataclass
+class EvaluationJob:
+    conversation_id: str
+    evaluation: str
+    lt_api_key: str = field(repr=False)
+    future: asyncio.Future = field(repr=False)
+
+
+def _run_job(job: EvaluationJob) -> Any:
+    """Fetch the conversation and run the evaluation; executes on a pool thread."""
+    fetched_payload = get_conversation_data(job.conversation_id, job.lt_api_key)
+    data_to_render = _get_data_to_render(fetched_payload)
+    api_key = _get_secret("OPENAI_API_KEY", os.getenv("OPENAI_API_KEY", "")).strip()
+    return run_evaluation(job.evaluation, data_to_render, api_key)
+
+
+class EvaluationPool:
+    """Bounded queue drained by a fixed number of async workers.
+
+    Model and labeling tool calls are blocking, so each worker hands its job to a
+    thread pool sized to the worker count. Submissions never wait for queue space:
+    when the queue cannot take a whole submission it is rejected outright.
+    """
+
+    def __init__(self, worker_count: int = WORKER_COUNT, max_depth: int = QUEUE_MAX_DEPTH) -> None:
+        self.worker_count = worker_count
+        self.max_depth = max_depth
+        self._queue: Optional[asyncio.Queue[EvaluationJob]] = None
+        self._workers: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._active = 0
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_depth)
+        self._executor = ThreadPoolExecutor(max_workers=self.worker_count, thread_name_prefix="evaluation")
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, conversation_ids: List[str], evaluation: str, lt_api_key: str) -> List[asyncio.Future]:
+        if self._queue is None:
+            raise RuntimeError("Evaluation pool is not running.")
+        free_slots = self.max_depth - self._queue.qsize()
+        if len(conversation_ids) > free_slots:
+            raise QueueFullError(f"Queue is full ({self._queue.qsize()}/{self.max_depth} jobs pending).")
+
+        loop = asyncio.get_running_loop()
+        futures: List[asyncio.Future] = []
+        for conversation_id in conversation_ids:
+            job = EvaluationJob(conversation_id, evaluation, lt_api_key, loop.create_future())
+            self._queue.put_nowait(job)
+            futures.append(job.future)
+        return futures
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.worker_count,
+            "active": self._active,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_depth": self.max_depth,
+        }
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            try:
+                # The client went away before the job was picked up.
+                if job.future.done():
+                    continue
+                self._active += 1
+                try:
+                    result = await loop.run_in_executor(self._executor, _run_job, job)
+                except Exception as error:  # noqa: BLE001
+                    if not job.future.done():
+                        job.future.set_exception(error)
+                else:
+                    if not job.future.done():
+                        job.future.set_result(result)
+                finally:
+                    self._active -= 1
+            finally:
+                self._queue.task_done()
+
+
+def _error_response(status: int, message: str) -> web.Response:
+    headers = {"Retry-After": str(RETRY_AFTER_SECONDS)} if status == 429 else None
+    return web.json_response({"error": message}, status=status, headers=headers)
+
+
+def _failure_status(error: BaseException) -> int:
+    """500 for local configuration errors, 502 for failed labeling tool or model calls."""
+    return 500 if isinstance(error, ValueError) else 502
+
+
+def _parse_conversation_id(value: Any) -> str:
+    if isinstance(value, bool) or not isinstance(value, (str, int)):
+        raise web.HTTPBadRequest(reason="Conversation IDs must be strings or integers.")
+    conversation_id = str(value).strip()
+    if not conversation_id:
+        raise web.HTTPBadRequest(reason="Conversation IDs must not be empty.")
+    return conversation_id
+
+
+def _resolve_lt_api_key(request: web.Request) -> str:
+    return (request.headers.get(LT_API_KEY_HEADER) or "").strip()
+
+
+async def _read_submission(request: web.Request) -> Dict[str, Any]:
+    try:
+        body = await request.json()
+    except ValueError as exc:
+        raise web.HTTPBadRequest(reason="Request body is not valid JSON.") from exc
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(reason="Request body must be a JSON object.")
+
+    evaluation = body.get("evaluation")
+    if evaluation not in EVALUATION_KEYS:
+        choices = ", ".join(EVALUATION_KEYS)
+        raise web.HTTPBadRequest(reason=f"'evaluation' must be one of: {choices}.")
+    return body
+
+
+def _submit(request: web.Request, conversation_ids: List[str], evaluation: str) -> List[asyncio.Future]:
+    lt_api_key = _resolve_lt_api_key(request)
+    if not lt_api_key:
+        raise web.HTTPUnauthorized(reason=f"Provide a labeling tool API key via the {LT_API_KEY_HEADER} header.")
+    pool: EvaluationPool = request.app["pool"]
+    try:
+        return pool.submit(conversation_ids, evaluation, lt_api_key)
+    except QueueFullError as exc:
+        raise web.HTTPTooManyRequests(reason=str(exc)) from exc
+
+
+async def handle_evaluation(request: web.Request) -> web.Response:
+    try:
+        body = await _read_submission(request)
+        if "conversation_id" not in body:
+            raise web.HTTPBadRequest(reason="'conversation_id' is required.")
+        conversation_id = _parse_conversation_id(body["conversation_id"])
+        (future,) = _submit(request, [conversation_id], body["evaluation"])
+    except web.HTTPException as exc:
+        return _error_response(exc.status, exc.reason)
+
+    try:
+        result = await future
+    except Exception as error:  # noqa: BLE001
+        return _error_response(_failure_status(error), f"Evaluation failed: {error}")
+
+    return web.json_response(
+        {"conversation_id": conversation_id, "evaluation": body["evaluation"], "result": result}
+    )
+
+
+async def handle_batch_evaluation(request: web.Request) -> web.Response:
+    try:
+        body = await _read_submission(request)
+        raw_ids = body.get("conversation_ids")
+        if not isinstance(raw_ids, list) or not raw_ids:
+            raise web.HTTPBadRequest(reason="'conversation_ids' must be a non-empty list.")
+        if len(raw_ids) > MAX_BATCH_SIZE:
+            raise web.HTTPBadRequest(reason=f"Batches are limited to {MAX_BATCH_SIZE} conversations.")
+        conversation_ids = [_parse_conversation_id(value) for value in raw_ids]
+        futures = _submit(request, conversation_ids, body["evaluation"])
+    except web.HTTPException as exc:
+        return _error_response(exc.status, exc.reason)
+
+    outcomes = await asyncio.gather(*futures, return_exceptions=True)
+    results: List[Dict[str, Any]] = []
+    for conversation_id, outcome in zip(conversation_ids, outcomes):
+        if isinstance(outcome, BaseException):
+            results.append(
+                {
+                    "conversation_id": conversation_id,
+                    "status": "error",
+                    "status_code": _failure_status(outcome),
+                    "error": str(outcome),
+                }
+            )
+        else:
+            results.append({"conversation_id": conversation_id, "status": "ok", "result": outcome})
+
+    return web.json_response({"evaluation": body["evaluation"], "results": results})
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    pool: EvaluationPool = request.app["pool"]
+    return web.json_response(
+        {"status": "ok", "pool": pool.stats(), "structured_output": structured_output_stats()}
+    )
+
+
+async def _start_pool(app: web.Application) -> None:
+    await app["pool"].start()
+
+
+async def _stop_pool(app: web.Application) -> None:
+    await app["pool"].stop()
+
+
+def create_app(pool: Optional[EvaluationPool] = None) -> web.Application:
+    app = web.Application()
+    app["pool"] = pool or EvaluationPool()
+    app.on_startup.append(_start_pool)
+    app.on_cleanup.append(_stop_pool)
+    app.router.add_post("/evaluations", handle_evaluation)
+    app.router.add_post("/evaluations/batch", handle_batch_evaluation)
+    app.router.add_get("/health", handle_health)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host=SERVICE_HOST, port=SERVICE_PORT)
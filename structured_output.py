@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import json
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Mapping, Tuple
+
+BREAKDOWN_ITEM_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "section": {"type": "string"},
+        "id": {"type": "string"},
+        "weight": {"type": "number"},
+        "type": {"type": "string", "enum": ["requirement", "negative_penalty"]},
+        "decision": {"type": "string", "enum": ["Pass", "Fail", "Triggered", "Not Triggered"]},
+        "reason": {"type": "string"},
+        "score_contribution": {"type": "number"},
+    },
+    "required": ["section", "id", "weight", "type", "decision", "reason", "score_contribution"],
+    "additionalProperties": False,
+}
+
+COMPLEXITY_TOTALS_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "positive_weight_total": {"type": "number"},
+        "negative_weight_total": {"type": "number"},
+        "score_before_penalties": {"type": "number"},
+        "penalties_applied": {"type": "number"},
+        "final_score": {"type": "number"},
+        "pass_rate_percent": {"type": "number"},
+    },
+    "required": [
+        "positive_weight_total",
+        "negative_weight_total",
+        "score_before_penalties",
+        "penalties_applied",
+        "final_score",
+        "pass_rate_percent",
+    ],
+    "additionalProperties": False,
+}
+
+COMPLEXITY_NOTES_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "method": {"type": "string"},
+        "assumptions": {"type": "string"},
+        "limitations": {"type": "string"},
+    },
+    "required": ["method", "assumptions", "limitations"],
+    "additionalProperties": False,
+}
+
+COMPLEXITY_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "totals": COMPLEXITY_TOTALS_SCHEMA,
+        "complexity_level": {"type": "string", "enum": ["Expert-level", "Hard-level", "Medium-level"]},
+        "breakdown": {"type": "array", "items": BREAKDOWN_ITEM_SCHEMA},
+        "notes": COMPLEXITY_NOTES_SCHEMA,
+    },
+    "required": ["totals", "complexity_level", "breakdown", "notes"],
+    "additionalProperties": False,
+}
+
+BREAKDOWN_RETRY_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {"breakdown": {"type": "array", "items": BREAKDOWN_ITEM_SCHEMA}},
+    "required": ["breakdown"],
+    "additionalProperties": False,
+}
+
+REQUIREMENT_ISSUE_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "string"},
+        "error_code": {
+            "type": "string",
+            "enum": [
+                "Cohesion",
+                "Objectivity",
+                "Comprehensiveness",
+                "Convention Following",
+                "Factuality",
+                "Writing Quality",
+            ],
+        },
+        "reason": {"type": "string"},
+        "rewrite_suggestion": {"type": "string"},
+    },
+    "required": ["id", "error_code", "reason", "rewrite_suggestion"],
+    "additionalProperties": False,
+}
+
+# Structured outputs need an object at the root, so the issue list is wrapped.
+REQUIREMENTS_FIXES_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {"issues": {"type": "array", "items": REQUIREMENT_ISSUE_SCHEMA}},
+    "required": ["issues"],
+    "additionalProperties": False,
+}
+
+# Key names follow the output contract in system_prompts.rubric_explanation.
+RUBRIC_EXPLANATION_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "research_topi": {"type": "string"},
+        "rubric_explnation": {"type": "string"},
+    },
+    "required": ["research_topi", "rubric_explnation"],
+    "additionalProperties": False,
+}
+
+RESPONSE_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "complexity_check": COMPLEXITY_SCHEMA,
+    "requirements_fixes": REQUIREMENTS_FIXES_SCHEMA,
+    "rubric_explanation": RUBRIC_EXPLANATION_SCHEMA,
+    "breakdown_retry": BREAKDOWN_RETRY_SCHEMA,
+}
+
+_DECODER = json.JSONDecoder()
+_STATS: Counter = Counter()
+_STATS_LOCK = threading.Lock()
+
+
+def response_format(schema_name: str) -> Dict[str, Any]:
+    """Build the strict json_schema response_format for one of RESPONSE_SCHEMAS."""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": schema_name, "strict": True, "schema": RESPONSE_SCHEMAS[schema_name]},
+    }
+
+
+def matches_schema(value: Any, schema: Mapping[str, Any]) -> bool:
+    """Check a value against the subset of JSON Schema used by RESPONSE_SCHEMAS."""
+    expected = schema.get("type")
+    if expected == "object":
+        if not isinstance(value, dict):
+            return False
+        properties = schema.get("properties", {})
+        if any(key not in value for key in schema.get("required", [])):
+            return False
+        if schema.get("additionalProperties") is False and any(key not in properties for key in value):
+            return False
+        return all(matches_schema(value[key], properties[key]) for key in value if key in properties)
+    if expected == "array":
+        item_schema = schema.get("items", {})
+        return isinstance(value, list) and all(matches_schema(item, item_schema) for item in value)
+    if expected == "string":
+        valid = isinstance(value, str)
+    elif expected == "number":
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+    elif expected == "integer":
+        valid = isinstance(value, int) and not isinstance(value, bool)
+    else:
+        valid = True
+    if valid and "enum" in schema:
+        valid = value in schema["enum"]
+    return valid
+
+
+def _skip_whitespace(text: str, index: int) -> int:
+    while index < len(text) and text[index] in " \t\r\n":
+        index += 1
+    return index
+
+
+def _salvage_array(text: str, index: int) -> List[Any]:
+    items: List[Any] = []
+    index += 1
+    while True:
+        index = _skip_whitespace(text, index)
+        try:
+            item, index = _DECODER.raw_decode(text, index)
+        except ValueError:
+            break
+        items.append(item)
+        index = _skip_whitespace(text, index)
+        if text[index:index + 1] != ",":
+            break
+        index += 1
+    return items
+
+
+def _strip_code_fence(text: str) -> str:
+    stripped = text.strip()
+    if not stripped.startswith("```"):
+        return stripped
+    stripped = stripped.split("\n", 1)[1] if "\n" in stripped else ""
+    if stripped.rstrip().endswith("```"):
+        stripped = stripped.rstrip()[:-3]
+    return stripped.strip()
+
+
+def salvage_json(text: str) -> Tuple[Any, bool]:
+    """Recover the complete members of a possibly malformed or truncated JSON response.
+
+    Returns ``(value, salvaged)``; ``salvaged`` is False only when the text (minus
+    any Markdown code fence) parsed strictly. Otherwise top-level object members
+    are kept while they decode, and an array that breaks off part way keeps the
+    items that were complete. ``value`` is None when nothing can be recovered.
+    """
+    text = _strip_code_fence(text or "")
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError:
+        pass
+
+    object_start = text.find("{")
+    array_start = text.find("[")
+    if array_start >= 0 and (object_start < 0 or array_start < object_start):
+        return _salvage_array(text, array_start) or None, True
+    if object_start < 0:
+        return None, True
+
+    recovered: Dict[str, Any] = {}
+    index = object_start + 1
+    while True:
+        index = _skip_whitespace(text, index)
+        try:
+            key, index = _DECODER.raw_decode(text, index)
+        except ValueError:
+            break
+        index = _skip_whitespace(text, index)
+        if not isinstance(key, str) or text[index:index + 1] != ":":
+            break
+        index = _skip_whitespace(text, index + 1)
+        try:
+            value, index = _DECODER.raw_decode(text, index)
+        except ValueError:
+            if text[index:index + 1] == "[":
+                recovered[key] = _salvage_array(text, index)
+            break
+        recovered[key] = value
+        index = _skip_whitespace(text, index)
+        if text[index:index + 1] != ",":
+            break
+        index += 1
+    return recovered or None, True
+
+
+def complexity_totals(breakdown: List[Mapping[str, Any]]) -> Dict[str, Any]:
+    """Recompute totals and the complexity level from breakdown items per the scoring rules."""
+    positive_weight_total = sum(item["weight"] for item in breakdown if item["weight"] > 0)
+    negative_weight_total = sum(item["weight"] for item in breakdown if item["weight"] < 0)
+    score_before_penalties = sum(item["score_contribution"] for item in breakdown if item["weight"] > 0)
+    penalties_applied = sum(item["score_contribution"] for item in breakdown if item["weight"] < 0)
+    final_score = min(max(score_before_penalties + penalties_applied, 0), positive_weight_total)
+    pass_rate = 100 * final_score / positive_weight_total if positive_weight_total else 0
+
+    if pass_rate <= 20:
+        complexity_level = "Expert-level"
+    elif pass_rate < 50:
+        complexity_level = "Hard-level"
+    else:
+        complexity_level = "Medium-level"
+
+    return {
+        "totals": {
+            "positive_weight_total": positive_weight_total,
+            "negative_weight_total": negative_weight_total,
+            "score_before_penalties": score_before_penalties,
+            "penalties_applied": penalties_applied,
+            "final_score": final_score,
+            "pass_rate_percent": round(pass_rate, 2),
+        },
+        "complexity_level": complexity_level,
+    }
+
+
+def record(event: str, count: int = 1) -> None:
+    """Count a structured output event.
+
+    Events: valid, salvaged, salvaged_items, discarded_items, retries, retried_items,
+    truncated, refusals, failed.
+    """
+    with _STATS_LOCK:
+        _STATS[event] += count
+
+
+def stats() -> Dict[str, int]:
+    with _STATS_LOCK:
+        return dict(_STATS)
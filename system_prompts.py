@@ -152,23 +152,25 @@ Use these codes when labeling issues:
 
 ### Output Format
 
-Return **only** the requirements that have *major issues (🟥)* requiring rewrite, formatted as follows:
+Return **only** the requirements that have *major issues (🟥)* requiring rewrite, as a single JSON object whose `issues` list holds one entry per requirement (use an empty list when none need rewriting), formatted as follows:
 
 ```json
-[
-  {
-    "id": "cross-pillar-synthesis-and-coherence",
-    "error_code": "Cohesion",
-    "reason": "Focuses only on one relationship (AI workload vs CapEx/Opex) instead of quantifying at least three inter-pillar dependencies across architecture, operations, and economics.",
-    "rewrite_suggestion": "The report must quantify at least three inter-pillar relationships—architecture ↔ operations, operations ↔ economics, and economics ↔ workforce—using measurable variables (e.g., AI workload GPU-hour CAGR vs CapEx/Opex delta ±10%) and reconcile variances within ±10–15%."
-  },
-  {
-    "id": "holistic-coverage",
-    "error_code": "Comprehensiveness",
-    "reason": "Requirement fails to include all five geographic regions and four major industries necessary for global foresight coverage.",
-    "rewrite_suggestion": "The report must quantify adoption rates and AI literacy metrics for five regions (NA, EMEA, APAC, LATAM, MEA) and four industries (Finance, Manufacturing, Healthcare, Energy) for 2030 and 2040, each with ±10–15% variance bands."
-  }
-]
+{
+  "issues": [
+    {
+      "id": "cross-pillar-synthesis-and-coherence",
+      "error_code": "Cohesion",
+      "reason": "Focuses only on one relationship (AI workload vs CapEx/Opex) instead of quantifying at least three inter-pillar dependencies across architecture, operations, and economics.",
+      "rewrite_suggestion": "The report must quantify at least three inter-pillar relationships—architecture ↔ operations, operations ↔ economics, and economics ↔ workforce—using measurable variables (e.g., AI workload GPU-hour CAGR vs CapEx/Opex delta ±10%) and reconcile variances within ±10–15%."
+    },
+    {
+      "id": "holistic-coverage",
+      "error_code": "Comprehensiveness",
+      "reason": "Requirement fails to include all five geographic regions and four major industries necessary for global foresight coverage.",
+      "rewrite_suggestion": "The report must quantify adoption rates and AI literacy metrics for five regions (NA, EMEA, APAC, LATAM, MEA) and four industries (Finance, Manufacturing, Healthcare, Energy) for 2030 and 2040, each with ±10–15% variance bands."
+    }
+  ]
+}
 ```
 
 
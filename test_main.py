@@ -0,0 +1,233 @@
+import json
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+import main
+import structured_output
+from sample_payloads import breakdown_item, complexity_response, issue, rubric
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    counter = Counter()
+    monkeypatch.setattr(structured_output, "_STATS", counter)
+    return counter
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Queue of canned model replies, keyed by the schema each call asks for."""
+    replies = {}
+    calls = []
+
+    def fake_call_model(messages, api_key, schema_name=None):
+        calls.append((schema_name, messages))
+        return replies[schema_name].pop(0)
+
+    monkeypatch.setattr(main, "_call_model", fake_call_model)
+    return replies, calls
+
+
+def test_complexity_retry_requests_only_missing_items(model, stats):
+    replies, calls = model
+    truncated = json.dumps(complexity_response([breakdown_item("a"), breakdown_item("b")]))
+    truncated = truncated[: truncated.index('"id": "b"')]
+    replies["complexity_check"] = [truncated]
+    replies["breakdown_retry"] = [json.dumps({"breakdown": [breakdown_item("B", 5, 0, "Fail"), breakdown_item("c")]})]
+
+    result = main.run_evaluation("complexity_check", rubric("a", "b", "c"), "key")
+
+    assert [item["id"] for item in result["breakdown"]] == ["a", "B", "c"]
+    assert result["totals"]["final_score"] == 10
+    assert result["complexity_level"] == "Medium-level"
+    assert result["notes"] == main.SALVAGED_NOTES
+    retry_payload = json.loads(calls[1][1][1]["content"])
+    assert retry_payload["Rubric Requirements"] == [{"id": "b"}, {"id": "c"}]
+    assert stats == Counter(retries=1, retried_items=2, salvaged=1, salvaged_items=1)
+
+
+def test_complexity_schema_valid_response_covering_rubric_is_returned_as_is(model, stats):
+    replies, calls = model
+    response = complexity_response([breakdown_item("A"), breakdown_item("B")])
+    replies["complexity_check"] = [json.dumps(response)]
+
+    assert main.run_evaluation("complexity_check", rubric("a", "b"), "key") == response
+    assert [schema for schema, _ in calls] == ["complexity_check"]
+    assert stats == Counter(valid=1)
+
+
+def test_complexity_schema_valid_response_missing_items_is_completed(model, stats):
+    replies, calls = model
+    replies["complexity_check"] = [json.dumps(complexity_response([breakdown_item("a", 10, 0, "Fail")]))]
+    replies["breakdown_retry"] = [json.dumps({"breakdown": [breakdown_item("b", 10, 10), breakdown_item("c", 10, 10)]})]
+
+    result = main.run_evaluation("complexity_check", rubric("a", "b", "c"), "key")
+
+    assert [schema for schema, _ in calls] == ["complexity_check", "breakdown_retry"]
+    assert [item["id"] for item in result["breakdown"]] == ["a", "b", "c"]
+    assert result["totals"]["final_score"] == 20
+    assert result["totals"]["pass_rate_percent"] == 66.67
+    assert result["complexity_level"] == "Medium-level"
+    assert result["notes"] == complexity_response([])["notes"]
+    assert stats == Counter(retries=1, retried_items=2, salvaged=1, salvaged_items=1)
+
+
+def test_complexity_schema_valid_response_with_untargetable_rubric_is_returned_as_is(model, stats):
+    replies, calls = model
+    response = complexity_response([breakdown_item("a")])
+    replies["complexity_check"] = [json.dumps(response)]
+
+    assert main.run_evaluation("complexity_check", rubric("a", "A", "b"), "key") == response
+    assert len(calls) == 1
+    assert stats == Counter(valid=1)
+
+
+def test_complexity_ids_match_after_normalising(model, stats):
+    replies, calls = model
+    text = json.dumps(complexity_response([breakdown_item(" A "), breakdown_item("B")]))
+    replies["complexity_check"] = [text[: text.index('"notes"')]]
+
+    result = main.run_evaluation("complexity_check", rubric("a", "b"), "key")
+
+    assert [item["id"] for item in result["breakdown"]] == [" A ", "B"]
+    assert [schema for schema, _ in calls] == ["complexity_check"]
+    assert stats == Counter(salvaged=1, salvaged_items=2)
+
+
+def test_complexity_duplicate_and_unknown_items_do_not_count(model, stats):
+    replies, calls = model
+    items = [
+        breakdown_item("a", 10, 10),
+        breakdown_item("a", 10, 10),
+        breakdown_item("b", 10, 0, "Fail"),
+        breakdown_item("invented", 10, 10),
+    ]
+    text = json.dumps(complexity_response(items))
+    replies["complexity_check"] = [text[: text.index('"notes"')]]
+
+    result = main.run_evaluation("complexity_check", rubric("a", "b"), "key")
+
+    assert [item["id"] for item in result["breakdown"]] == ["a", "b"]
+    assert result["totals"]["positive_weight_total"] == 20
+    assert result["totals"]["pass_rate_percent"] == 50
+    assert result["complexity_level"] == "Medium-level"
+    assert len(calls) == 1
+    assert stats == Counter(discarded_items=2, salvaged=1, salvaged_items=2)
+
+
+def test_complexity_duplicates_in_valid_response_are_dropped(model, stats):
+    replies, _ = model
+    items = [breakdown_item("a", 10, 10), breakdown_item("a", 10, 10), breakdown_item("b", 10, 0, "Fail")]
+    replies["complexity_check"] = [json.dumps(complexity_response(items))]
+
+    result = main.run_evaluation("complexity_check", rubric("a", "b"), "key")
+
+    assert result["totals"]["pass_rate_percent"] == 50
+    assert stats == Counter(discarded_items=1, salvaged=1, salvaged_items=2)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [rubric("a", "A"), rubric("a", ""), rubric(), {"rubric_entries": [{"text": "no id"}]}],
+)
+def test_complexity_non_targetable_rubric_fails_without_retry(model, stats, data):
+    replies, calls = model
+    replies["complexity_check"] = ['{"breakdown": [']
+
+    with pytest.raises(RuntimeError, match="not valid JSON"):
+        main.run_evaluation("complexity_check", data, "key")
+    assert len(calls) == 1
+    assert stats == Counter(failed=1)
+
+
+def test_complexity_fails_when_retry_cannot_fill_gap(model, stats):
+    replies, _ = model
+    replies["complexity_check"] = ['{"breakdown": [']
+    replies["breakdown_retry"] = ['{"breakdown": []}']
+
+    with pytest.raises(RuntimeError, match="missing breakdown items for: a"):
+        main.run_evaluation("complexity_check", rubric("a"), "key")
+    assert stats == Counter(retries=1, retried_items=1, failed=1)
+
+
+def test_requirements_fixes_valid_response(model, stats):
+    replies, _ = model
+    replies["requirements_fixes"] = [json.dumps({"issues": [issue("x")]})]
+
+    assert main.run_evaluation("requirements_fixes", rubric("x"), "key") == {"issues": [issue("x")], "incomplete": False}
+    assert stats == Counter(valid=1)
+
+
+def test_requirements_fixes_bare_array_is_not_counted_as_salvaged(model, stats):
+    replies, _ = model
+    replies["requirements_fixes"] = [json.dumps([issue("x")])]
+
+    assert main.run_evaluation("requirements_fixes", rubric("x"), "key")["incomplete"] is False
+    assert stats == Counter(valid=1)
+
+
+def test_requirements_fixes_truncated_response_is_marked_incomplete(model, stats):
+    replies, _ = model
+    replies["requirements_fixes"] = [json.dumps({"issues": [issue("x")]})[:-2] + ', {"id": "y", "err']
+
+    assert main.run_evaluation("requirements_fixes", rubric("x", "y"), "key") == {
+        "issues": [issue("x")],
+        "incomplete": True,
+    }
+    assert stats == Counter(salvaged=1, salvaged_items=1)
+
+
+def test_requirements_fixes_truncated_response_with_no_issues_fails(model, stats):
+    replies, _ = model
+    replies["requirements_fixes"] = ['{"issues": [']
+
+    with pytest.raises(RuntimeError, match="No complete requirement issues"):
+        main.run_evaluation("requirements_fixes", rubric("x"), "key")
+    assert stats == Counter(failed=1)
+
+
+def test_evaluate_complexity_level_rejects_unknown_evaluation():
+    with pytest.raises(ValueError, match="Unknown evaluation"):
+        main.evaluate_complexity_level(rubric("a"), "key", "requirements_fixes")
+
+
+class FakeCompletions:
+    def __init__(self, content, refusal=None, finish_reason="stop"):
+        message = SimpleNamespace(content=content, refusal=refusal)
+        self.completion = SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=finish_reason)])
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return self.completion
+
+
+def fake_openai(monkeypatch, completions):
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(main, "OpenAI", lambda **kwargs: client)
+
+
+def test_call_model_requests_strict_schema(monkeypatch, stats):
+    completions = FakeCompletions('{"breakdown": []}')
+    fake_openai(monkeypatch, completions)
+
+    assert main._call_model([], "key", schema_name="breakdown_retry") == '{"breakdown": []}'
+    assert completions.requests[0]["response_format"] == structured_output.response_format("breakdown_retry")
+    assert stats == Counter()
+
+
+def test_call_model_surfaces_refusal(monkeypatch, stats):
+    fake_openai(monkeypatch, FakeCompletions(None, refusal="I can't help with that."))
+
+    with pytest.raises(RuntimeError, match="Model refused the request: I can't help with that."):
+        main._call_model([], "key", schema_name="complexity_check")
+    assert stats == Counter(refusals=1)
+
+
+def test_call_model_records_truncation(monkeypatch, stats):
+    fake_openai(monkeypatch, FakeCompletions('{"breakdown": [', finish_reason="length"))
+
+    assert main._call_model([], "key", schema_name="complexity_check") == '{"breakdown": ['
+    assert stats == Counter(truncated=1)
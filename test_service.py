@@ -0,0 +1,180 @@
+import pytest
+
+import main
+import service
+from service import EvaluationPool, create_app
+
+HEADERS = {service.LT_API_KEY_HEADER: "lt-token"}
+
+
+@pytest.fixture
+def run_job_calls(monkeypatch):
+    calls = []
+
+    def fake_run_job(job):
+        calls.append(job.conversation_id)
+        if job.conversation_id == "bad":
+            raise RuntimeError("conversation fetch failed")
+        if job.conversation_id == "misconfigured":
+            raise ValueError("INSTANCE_URL is not configured.")
+        return {"conversation": job.conversation_id, "evaluation": job.evaluation}
+
+    monkeypatch.setattr(service, "_run_job", fake_run_job)
+    return calls
+
+
+async def test_single_evaluation_returns_result(aiohttp_client, run_job_calls):
+    client = await aiohttp_client(create_app(EvaluationPool(worker_count=1, max_depth=4)))
+    response = await client.post(
+        "/evaluations", json={"conversation_id": "42", "evaluation": "complexity_check"}, headers=HEADERS
+    )
+    assert response.status == 200
+    body = await response.json()
+    assert body["result"] == {"conversation": "42", "evaluation": "complexity_check"}
+    assert run_job_calls == ["42"]
+
+
+async def test_integer_conversation_ids_are_accepted(aiohttp_client, run_job_calls):
+    client = await aiohttp_client(create_app(EvaluationPool(worker_count=1, max_depth=4)))
+    response = await client.post(
+        "/evaluations", json={"conversation_id": 0, "evaluation": "complexity_check"}, headers=HEADERS
+    )
+    assert response.status == 200
+    response = await client.post(
+        "/evaluations/batch", json={"conversation_ids": [7, "8"], "evaluation": "complexity_check"}, headers=HEADERS
+    )
+    assert response.status == 200
+    assert run_job_calls == ["0", "7", "8"]
+
+
+async def test_configuration_errors_are_not_reported_as_upstream_failures(aiohttp_client, run_job_calls):
+    client = await aiohttp_client(create_app(EvaluationPool(worker_count=1, max_depth=4)))
+    response = await client.post(
+        "/evaluations", json={"conversation_id": "misconfigured", "evaluation": "complexity_check"}, headers=HEADERS
+    )
+    assert response.status == 500
+    response = await client.post(
+        "/evaluations", json={"conversation_id": "bad", "evaluation": "complexity_check"}, headers=HEADERS
+    )
+    assert response.status == 502
+
+
+def test_job_repr_hides_labeling_tool_key():
+    job = service.EvaluationJob("1", "complexity_check", "lt-secret-token", None)
+    assert "lt-secret-token" not in repr(job)
+
+
+def test_run_job_reads_settings_without_streamlit_secrets(monkeypatch):
+    requested_urls = []
+
+    class FakeResponse:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {}
+
+    def fake_get(url, headers, timeout):
+        requested_urls.append(url)
+        return FakeResponse()
+
+    monkeypatch.setenv("INSTANCE_URL", "https://labeling.example")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-env")
+    monkeypatch.setattr(main.requests, "get", fake_get)
+    monkeypatch.setattr(service, "run_evaluation", lambda evaluation, data, api_key: api_key)
+
+    job = service.EvaluationJob("1", "complexity_check", "lt-token", None)
+    assert service._run_job(job) == "sk-env"
+    assert requested_urls == ["https://labeling.example/delivery/client/external/conversations/1"]
+
+
+async def test_submission_larger_than_free_queue_slots_is_rejected(aiohttp_client, run_job_calls):
+    client = await aiohttp_client(create_app(EvaluationPool(worker_count=1, max_depth=1)))
+    response = await client.post(
+        "/evaluations/batch",
+        json={"conversation_ids": ["1", "2"], "evaluation": "complexity_check"},
+        headers=HEADERS,
+    )
+    assert response.status == 429
+    assert response.headers["Retry-After"] == str(service.RETRY_AFTER_SECONDS)
+    assert run_job_calls == []
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        "not json",
+        ["a", "list"],
+        {"conversation_id": "1", "evaluation": "unknown"},
+        {"evaluation": "complexity_check"},
+        {"conversation_id": None, "evaluation": "complexity_check"},
+        {"conversation_id": {"id": 1}, "evaluation": "complexity_check"},
+        {"conversation_id": True, "evaluation": "complexity_check"},
+        {"conversation_id": " ", "evaluation": "complexity_check"},
+    ],
+)
+async def test_bad_single_bodies_are_rejected(aiohttp_client, run_job_calls, payload):
+    client = await aiohttp_client(create_app(EvaluationPool(worker_count=1, max_depth=4)))
+    if isinstance(payload, str):
+        response = await client.post("/evaluations", data=payload, headers=HEADERS)
+    else:
+        response = await client.post("/evaluations", json=payload, headers=HEADERS)
+    assert response.status == 400
+    assert "error" in await response.json()
+    assert run_job_calls == []
+
+
+@pytest.mark.parametrize(
+    "conversation_ids",
+    [[], "1,2", ["1", " "], ["1", None], ["1", ["2"]], ["1", 2.5], ["1", "2", "3"]],
+)
+async def test_bad_batches_are_rejected(aiohttp_client, run_job_calls, monkeypatch, conversation_ids):
+    monkeypatch.setattr(service, "MAX_BATCH_SIZE", 2)
+    client = await aiohttp_client(create_app(EvaluationPool(worker_count=1, max_depth=8)))
+    response = await client.post(
+        "/evaluations/batch",
+        json={"conversation_ids": conversation_ids, "evaluation": "complexity_check"},
+        headers=HEADERS,
+    )
+    assert response.status == 400
+    assert run_job_calls == []
+
+
+async def test_missing_labeling_tool_key_is_rejected(aiohttp_client, run_job_calls):
+    client = await aiohttp_client(create_app(EvaluationPool(worker_count=1, max_depth=4)))
+    response = await client.post("/evaluations", json={"conversation_id": "1", "evaluation": "complexity_check"})
+    assert response.status == 401
+    assert run_job_calls == []
+
+
+async def test_batch_reports_errors_per_item(aiohttp_client, run_job_calls):
+    client = await aiohttp_client(create_app(EvaluationPool(worker_count=2, max_depth=4)))
+    response = await client.post(
+        "/evaluations/batch",
+        json={"conversation_ids": ["1", "bad", "3"], "evaluation": "rubric_explanation"},
+        headers=HEADERS,
+    )
+    assert response.status == 200
+    results = (await response.json())["results"]
+    assert [result["status"] for result in results] == ["ok", "error", "ok"]
+    assert results[1] == {
+        "conversation_id": "bad",
+        "status": "error",
+        "status_code": 502,
+        "error": "conversation fetch failed",
+    }
+    assert results[2]["result"] == {"conversation": "3", "evaluation": "rubric_explanation"}
+
+
+async def test_worker_skips_cancelled_jobs(run_job_calls):
+    pool = EvaluationPool(worker_count=1, max_depth=4)
+    await pool.start()
+    try:
+        first, second, third = pool.submit(["1", "2", "3"], "complexity_check", "lt-token")
+        second.cancel()
+        assert await first == {"conversation": "1", "evaluation": "complexity_check"}
+        assert await third == {"conversation": "3", "evaluation": "complexity_check"}
+        await pool._queue.join()
+    finally:
+        await pool.stop()
+    assert run_job_calls == ["1", "3"]
@@ -0,0 +1,118 @@
+import json
+
+import pytest
+
+from sample_payloads import breakdown_item
+from structured_output import (
+    BREAKDOWN_ITEM_SCHEMA,
+    COMPLEXITY_SCHEMA,
+    REQUIREMENTS_FIXES_SCHEMA,
+    complexity_totals,
+    matches_schema,
+    salvage_json,
+)
+
+
+def test_salvage_json_strict_parse_is_not_salvaged():
+    assert salvage_json('{"issues": []}') == ({"issues": []}, False)
+
+
+def test_salvage_json_keeps_complete_members_of_truncated_object():
+    text = json.dumps({"complexity_level": "Hard-level", "breakdown": [breakdown_item("a")], "notes": {}})
+    value, salvaged = salvage_json(text[: text.index('"notes"') + 5])
+    assert salvaged
+    assert value == {"complexity_level": "Hard-level", "breakdown": [breakdown_item("a")]}
+
+
+def test_salvage_json_drops_truncated_array_member():
+    text = '{"issues": [{"id": "x"}, {"id": "y", "err'
+    assert salvage_json(text) == ({"issues": [{"id": "x"}]}, True)
+
+
+def test_salvage_json_truncated_empty_array_is_salvaged():
+    assert salvage_json('{"issues": [') == ({"issues": []}, True)
+
+
+def test_salvage_json_truncated_top_level_array():
+    assert salvage_json('[{"a": 1}, {"b": ') == ([{"a": 1}], True)
+
+
+def test_salvage_json_strips_code_fence():
+    assert salvage_json('```json\n{"a": 1}\n```') == ({"a": 1}, False)
+    assert salvage_json('```json\n{"a": 1, "b": [1, 2') == ({"a": 1, "b": [1, 2]}, True)
+
+
+@pytest.mark.parametrize("text", ["", "   ", "not json at all", None])
+def test_salvage_json_without_recoverable_content(text):
+    assert salvage_json(text) == (None, True)
+
+
+def test_matches_schema_accepts_complete_item():
+    assert matches_schema(breakdown_item("a"), BREAKDOWN_ITEM_SCHEMA)
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {"extra": 1},
+        {"decision": "Maybe"},
+        {"weight": "5"},
+        {"weight": True},
+        {"id": None},
+    ],
+)
+def test_matches_schema_rejects_invalid_item(changes):
+    assert not matches_schema({**breakdown_item("a"), **changes}, BREAKDOWN_ITEM_SCHEMA)
+
+
+def test_matches_schema_rejects_missing_required_key():
+    item = breakdown_item("a")
+    del item["reason"]
+    assert not matches_schema(item, BREAKDOWN_ITEM_SCHEMA)
+
+
+def test_matches_schema_checks_nested_items():
+    assert matches_schema({"issues": []}, REQUIREMENTS_FIXES_SCHEMA)
+    assert not matches_schema({"issues": [{"id": "x"}]}, REQUIREMENTS_FIXES_SCHEMA)
+    assert not matches_schema([], REQUIREMENTS_FIXES_SCHEMA)
+    assert not matches_schema({"breakdown": []}, COMPLEXITY_SCHEMA)
+
+
+@pytest.mark.parametrize(
+    "passed_weight, expected_level",
+    [(20, "Expert-level"), (21, "Hard-level"), (49, "Hard-level"), (50, "Medium-level")],
+)
+def test_complexity_totals_threshold_edges(passed_weight, expected_level):
+    breakdown = [
+        breakdown_item("pass", passed_weight, passed_weight),
+        breakdown_item("fail", 100 - passed_weight, 0, "Fail"),
+    ]
+    result = complexity_totals(breakdown)
+    assert result["totals"]["pass_rate_percent"] == passed_weight
+    assert result["complexity_level"] == expected_level
+
+
+def test_complexity_totals_applies_penalties_and_clamps_at_zero():
+    breakdown = [
+        breakdown_item("a", 10, 4),
+        breakdown_item("penalty", -6, -6, "Triggered", "negative_penalty"),
+    ]
+    totals = complexity_totals(breakdown)["totals"]
+    assert totals["positive_weight_total"] == 10
+    assert totals["negative_weight_total"] == -6
+    assert totals["score_before_penalties"] == 4
+    assert totals["penalties_applied"] == -6
+    assert totals["final_score"] == 0
+    assert totals["pass_rate_percent"] == 0
+
+
+def test_complexity_totals_clamps_at_positive_total():
+    totals = complexity_totals([breakdown_item("a", 10, 15)])["totals"]
+    assert totals["final_score"] == 10
+    assert totals["pass_rate_percent"] == 100
+
+
+def test_complexity_totals_without_positive_weight():
+    result = complexity_totals([breakdown_item("penalty", -5, 0, "Not Triggered", "negative_penalty")])
+    assert result["totals"]["pass_rate_percent"] == 0
+    assert result["complexity_level"] == "Expert-level"